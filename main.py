@@ -1,180 +1,643 @@
-import pyautogui
-import cv2
-import numpy as np
-import time
-import os
-import sys
-import logging
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
-
-# -------------------- SAFETY --------------------
-pyautogui.FAILSAFE = True  # move mouse to top-left corner to abort
-pyautogui.PAUSE = 0.05
-
-# -------------------- PATHS --------------------
-TARGETS = {
-    "I AM AVAILABLE": r"data/i'm_available.png",
-    "OK": r"data/ok.png"
-}
-SCREENSHOT_DIR = r"data/screenshots"
-LOG_DIR = r"data/logs"
-
-os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# -------------------- LOGGING --------------------
-LOG_FILE = os.path.join(LOG_DIR, "screen_monitor.log")
-logger = logging.getLogger("ScreenMonitor")
-logger.setLevel(logging.INFO)
-
-# Prevent duplicate handlers if script is re-run in same interpreter
-if not logger.handlers:
-    file_handler = RotatingFileHandler(
-        LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"
-    )
-    file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(file_formatter)
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-    try:
-        console_handler.stream.reconfigure(encoding="utf-8", errors="replace")
-    except Exception:
-        pass
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-# -------------------- LOAD TARGETS --------------------
-templates = {}
-for name, path in TARGETS.items():
-    img = cv2.imread(path)
-    if img is None:
-        logger.error(f"Target image not found: {path}")
-        raise FileNotFoundError(path)
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    templates[name] = {"edges": edges, "shape": edges.shape[:2]}
-
-logger.info(f"Loaded target templates: {', '.join(TARGETS.keys())}")
-
-# -------------------- CONFIG --------------------
-MATCH_THRESHOLD = 0.70
-LOOP_SLEEP_SEC = 30
-
-# Avoid rapid repeated clicks if UI lags
-CLICK_COOLDOWN_SEC = 15
-_last_click_ts = {k: 0.0 for k in TARGETS.keys()}
-
-# -------------------- FUNCTIONS --------------------
-def capture_screen() -> str:
-    """Capture the current screen and save it with timestamp."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filepath = os.path.join(SCREENSHOT_DIR, f"screenshot_{timestamp}.png")
-    screenshot = pyautogui.screenshot()
-    screenshot.save(filepath)
-    logger.info(f"Screenshot captured: {filepath}")
-    return filepath
-
-def multi_scale_match(screen_gray_edges: np.ndarray, target_edges: np.ndarray):
-    """Perform robust multi-scale template matching on edge maps."""
-    (tH, tW) = target_edges.shape[:2]
-    found = None
-
-    for scale in np.linspace(0.8, 1.2, 11):  # 80–120% zoom
-        resized = cv2.resize(
-            screen_gray_edges, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR
-        )
-        r = screen_gray_edges.shape[1] / float(resized.shape[1])
-
-        if resized.shape[0] < tH or resized.shape[1] < tW:
-            continue
-
-        result = cv2.matchTemplate(resized, target_edges, cv2.TM_CCOEFF_NORMED)
-        _, maxVal, _, maxLoc = cv2.minMaxLoc(result)
-
-        if found is None or maxVal > found[0]:
-            found = (maxVal, maxLoc, r)
-
-    return found  # (confidence, location, ratio)
-
-def find_best_target(screen_bgr: np.ndarray):
-    """Return best target match info across all templates."""
-    screen_gray = cv2.cvtColor(screen_bgr, cv2.COLOR_BGR2GRAY)
-    screen_edges = cv2.Canny(screen_gray, 50, 150)
-
-    best_target = None
-    best_conf = 0.0
-    best_coords = None
-
-    for name, t in templates.items():
-        found = multi_scale_match(screen_edges, t["edges"])
-        if found:
-            maxVal, maxLoc, r = found
-            if maxVal > best_conf:
-                best_conf = maxVal
-                best_target = name
-                best_coords = (maxLoc, r, t["shape"])
-
-    return best_target, best_conf, best_coords
-
-def click_target(best_target: str, best_conf: float, best_coords):
-    """Click the best matched target if above threshold and not in cooldown."""
-    if not best_target or best_conf < MATCH_THRESHOLD:
-        logger.info(f"No button found. Best confidence={best_conf:.3f}")
-        return False
-
-    now = time.time()
-    if (now - _last_click_ts.get(best_target, 0.0)) < CLICK_COOLDOWN_SEC:
-        logger.info(
-            f"Cooldown active for '{best_target}'. Skipping click. conf={best_conf:.3f}"
-        )
-        return False
-
-    maxLoc, r, (tH, tW) = best_coords
-    startX, startY = (int(maxLoc[0] * r), int(maxLoc[1] * r))
-    endX, endY = (int((maxLoc[0] + tW) * r), int((maxLoc[1] + tH) * r))
-    x_center = startX + (endX - startX) // 2
-    y_center = startY + (endY - startY) // 2
-
-    pyautogui.click(x_center, y_center)
-    _last_click_ts[best_target] = now
-
-    logger.info(f"Clicked '{best_target}' at ({x_center}, {y_center}) [conf={best_conf:.3f}]")
-    return True
-
-def find_and_click(screenshot_path: str) -> bool:
-    """Load screenshot, find best target, click if valid."""
-    screen = cv2.imread(screenshot_path)
-    if screen is None:
-        logger.warning(f"Failed to read screenshot: {screenshot_path}")
-        return False
-
-    best_target, best_conf, best_coords = find_best_target(screen)
-    # Log the best candidate even if below threshold
-    if best_target:
-        logger.info(f"Best match: '{best_target}' conf={best_conf:.3f}")
-    return click_target(best_target, best_conf, best_coords)
-
-# -------------------- MAIN LOOP --------------------
-if __name__ == "__main__":
-    logger.info("Screen monitoring started. Press Ctrl+C to stop.")
-    while True:
-        try:
-            screenshot_path = capture_screen()
-            find_and_click(screenshot_path)
-            time.sleep(LOOP_SLEEP_SEC)
-
-        except KeyboardInterrupt:
-            logger.info("Script stopped by user.")
-            break
-
-        except pyautogui.FailSafeException:
-            logger.warning("PyAutoGUI FAILSAFE triggered (mouse moved to top-left). Exiting.")
-            break
-
-        except Exception as e:
-            logger.exception(f"Unexpected error: {e}")
-            time.sleep(LOOP_SLEEP_SEC)
+import pyautogui
+import cv2
+import mss
+import numpy as np
+import time
+import os
+import sys
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+from logging.handlers import MemoryHandler, RotatingFileHandler
+
+# -------------------- SAFETY --------------------
+pyautogui.FAILSAFE = True  # move mouse to top-left corner to abort
+pyautogui.PAUSE = 0.05
+
+# -------------------- PATHS --------------------
+TARGETS = {
+    "I AM AVAILABLE": r"data/i'm_available.png",
+    "OK": r"data/ok.png"
+}
+SCREENSHOT_DIR = r"data/screenshots"
+LOG_DIR = r"data/logs"
+
+os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+os.makedirs(LOG_DIR, exist_ok=True)
+
+# -------------------- LOGGING --------------------
+LOG_FILE = os.path.join(LOG_DIR, "screen_monitor.log")
+logger = logging.getLogger("ScreenMonitor")
+logger.setLevel(logging.INFO)
+
+# Prevent duplicate handlers if script is re-run in same interpreter
+if not logger.handlers:
+    file_handler = RotatingFileHandler(
+        LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8"
+    )
+    file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler.setFormatter(file_formatter)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    try:
+        console_handler.stream.reconfigure(encoding="utf-8", errors="replace")
+    except Exception:
+        pass
+
+    # Batch file writes: RotatingFileHandler flushes per record, so buffer 64
+    # records in memory and flush on warnings/errors (or when the buffer
+    # fills) to cut disk syscalls on the hot path.
+    logger.addHandler(
+        MemoryHandler(capacity=64, flushLevel=logging.WARNING, target=file_handler)
+    )
+    logger.addHandler(console_handler)
+
+# -------------------- OPENCL --------------------
+# OpenCV T-API: arrays wrapped in cv2.UMat dispatch to OpenCL kernels on any
+# capable (i)GPU. Dispatch overhead outweighs the win for tiny ROIs, so the
+# UMat path only kicks in above OPENCL_MIN_ROI_PIXELS.
+USE_OPENCL = cv2.ocl.haveOpenCL()
+OPENCL_MIN_ROI_PIXELS = 256 * 256
+if USE_OPENCL:
+    cv2.ocl.setUseOpenCL(True)
+
+# -------------------- LOAD TARGETS --------------------
+# Optional SWAR-style prefilter: binarize the screen, bit-pack 8 px/byte and
+# score byte-aligned windows by Hamming distance (XOR + popcount LUT), then
+# refine the best cell with the normal matcher. Off by default; the mean
+# intensity prune is usually enough, and this pass assumes high-contrast UI
+# art that survives a fixed binarization threshold.
+USE_HAMMING = False
+HAMMING_BIN_THRESHOLD = 127
+
+# The UI does not rescale between ticks, so by default we match at 1.0 only.
+# Set MULTISCALE=True for a one-off calibration run: the sweep logs the best
+# scale per hit, which can then be baked into TEMPLATE_SCALE.
+MULTISCALE = False
+TEMPLATE_SCALE = 1.0
+MATCH_SCALES = np.linspace(0.8, 1.2, 11)  # 80–120% zoom (calibration only)
+SCALE_COARSE = (0.8, 1.0, 1.2)  # pass-1 scales; pass 2 refines on the grid
+SCALE_STEP = 0.04  # grid spacing of MATCH_SCALES
+
+templates = {}
+for name, path in TARGETS.items():
+    img = cv2.imread(path)
+    if img is None:
+        logger.error("Target image not found: %s", path)
+        raise FileNotFoundError(path)
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    # Resize the small template once per scale at load time instead of
+    # resizing the full screen every tick (template area is <1% of screen).
+    scales = list(MATCH_SCALES) if MULTISCALE else [TEMPLATE_SCALE]
+    pyramid = [
+        (cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+         if s != 1.0 else gray, s)
+        for s in scales
+    ]
+    templates[name] = {"gray": gray, "pyramid": pyramid, "mean": float(gray.mean())}
+    if USE_HAMMING:
+        templates[name]["packed"] = np.packbits(gray > HAMMING_BIN_THRESHOLD, axis=1)
+    if USE_OPENCL:
+        # GPU-resident copies, parallel to "pyramid".
+        templates[name]["pyramid_u"] = [cv2.UMat(img) for img, _ in pyramid]
+
+logger.info("Loaded target templates: %s", ", ".join(TARGETS.keys()))
+
+# -------------------- CONFIG --------------------
+MATCH_THRESHOLD = 0.70
+
+# Change-driven loop: capture and fingerprint the screen every
+# CHANGE_POLL_SEC, but only run the full match pipeline when the screen
+# actually changed (or every FULL_SCAN_SEC as a safety net). This drops idle
+# CPU to near zero while cutting popup reaction time from up to 30 s to ~1 s.
+CHANGE_POLL_SEC = 1.0
+FULL_SCAN_SEC = 30
+
+# Two-stage cascade prefilter: windows whose mean intensity is further than
+# this from the template's mean cannot be good matches and are pruned via
+# O(1) integral-image sums before the expensive matcher runs.
+MEAN_PRUNE_TAU = 25.0
+
+# Restrict matching to a fixed screen region (x, y, w, h) when the dialog
+# always appears in the same place; None searches the full frame.
+ROI_RECT = None
+
+# Temporal locality: dialogs reappear where they were last seen, so a small
+# window centered on the previous hit is searched before anything else.
+TRACK_WINDOW = 256
+_last_hit = {}  # target name -> (x_center, y_center) of the last click
+
+# Archive frames where no target crossed the threshold (debugging misses).
+# Writes happen on a background thread so the hot path never blocks on disk,
+# and only the newest SCREENSHOT_KEEP files are retained.
+SAVE_SCREENSHOTS = False
+SCREENSHOT_KEEP = 10
+
+# Avoid rapid repeated clicks if UI lags
+CLICK_COOLDOWN_SEC = 15
+_last_click_ts = {k: 0.0 for k in TARGETS.keys()}
+
+# -------------------- CAPTURE --------------------
+# One mss instance reused across ticks so the BGRA buffer is allocated once.
+_sct = mss.mss()
+
+# Precomputed filename prefix: the archive path can fire on every missed
+# tick, and strftime + path join per call add up under event-driven capture.
+_SS_PREFIX = os.path.join(SCREENSHOT_DIR, "screenshot_")
+
+def _archive_screenshot(frame: np.ndarray):
+    """Write a debug copy of the frame to disk (runs on a background thread).
+
+    JPEG at quality 80 encodes an order of magnitude faster and smaller than
+    the old PNG writes; old files beyond SCREENSHOT_KEEP are pruned so disk
+    usage stays bounded.
+    """
+    filepath = f"{_SS_PREFIX}{time.time_ns()}.jpg"
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)  # JPEG has no alpha
+    cv2.imwrite(filepath, frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    logger.info("Screenshot archived: %s", filepath)
+
+    shots = sorted(
+        f for f in os.listdir(SCREENSHOT_DIR) if f.startswith("screenshot_")
+    )
+    for old in shots[:-SCREENSHOT_KEEP]:
+        try:
+            os.remove(os.path.join(SCREENSHOT_DIR, old))
+        except OSError:
+            pass
+
+# -------------------- FUNCTIONS --------------------
+def capture_screen() -> np.ndarray:
+    """Capture the current screen and return it as a BGRA ndarray (no disk I/O).
+
+    The BGRA buffer is handed over as-is: converting to BGR here would cost a
+    full extra pass over ~8 MB that the matcher does not need, since it goes
+    straight to grayscale anyway.
+    """
+    raw = _sct.grab(_sct.monitors[1])
+    return np.frombuffer(raw.bgra, dtype=np.uint8).reshape(raw.height, raw.width, 4)
+
+def frame_fingerprint(frame: np.ndarray) -> int:
+    """Cheap change-detection hash over a strided sample of the frame.
+
+    Samples roughly a 16x16 grid of pixels; a hash collision merely costs one
+    skipped scan until the next FULL_SCAN_SEC safety pass.
+    """
+    step_y = max(1, frame.shape[0] // 16)
+    step_x = max(1, frame.shape[1] // 16)
+    return hash(frame[::step_y, ::step_x].tobytes())
+
+def prepare_screen_ctx(screen_gray: np.ndarray):
+    """Precompute the screen DFT and integral images shared by all templates.
+
+    cv2.matchTemplate re-transforms the screen for every call; computing the
+    DFT (and the integral images used for normalization) once per tick lets
+    every template/scale reuse it.
+    """
+    screen_f = np.float32(screen_gray)
+    dft_screen = cv2.dft(screen_f, flags=cv2.DFT_COMPLEX_OUTPUT)
+    screen_sum, screen_sqsum = cv2.integral2(screen_f)
+    return dft_screen, screen_sum, screen_sqsum
+
+# Templates are immutable, so their padded DFTs only depend on screen size;
+# cache them across ticks instead of re-transforming on every call. Keyed by
+# array identity, which is stable because pyramids live for the process.
+_tpl_dft_cache = {}
+
+def _template_dft(tpl: np.ndarray, sH: int, sW: int):
+    """Return (dft, norm) of the zero-mean template padded to screen size."""
+    key = (id(tpl), sH, sW)
+    cached = _tpl_dft_cache.get(key)
+    if cached is None:
+        tpl_zm = np.float32(tpl) - np.float32(tpl).mean()
+        tpl_norm = float(np.sqrt((tpl_zm * tpl_zm).sum()))
+        padded = np.zeros((sH, sW), np.float32)
+        padded[: tpl.shape[0], : tpl.shape[1]] = tpl_zm
+        cached = (cv2.dft(padded, flags=cv2.DFT_COMPLEX_OUTPUT), tpl_norm)
+        _tpl_dft_cache[key] = cached
+    return cached
+
+def fft_match(screen_ctx, tpl: np.ndarray):
+    """Correlate one template against the shared screen DFT.
+
+    Emulates cv2.matchTemplate(..., cv2.TM_CCOEFF_NORMED): the zero-mean
+    template is correlated in the frequency domain, then each window score is
+    normalized by the window's standard deviation (from the integral images)
+    and the template norm.
+    """
+    dft_screen, screen_sum, screen_sqsum = screen_ctx
+    sH, sW = dft_screen.shape[:2]
+    tH, tW = tpl.shape[:2]
+    if sH < tH or sW < tW:
+        return None
+
+    dft_tpl, tpl_norm = _template_dft(tpl, sH, sW)
+    if tpl_norm < 1e-6:
+        return None
+
+    corr = cv2.idft(
+        cv2.mulSpectrums(dft_screen, dft_tpl, 0, conjB=True),
+        flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT,
+    )[: sH - tH + 1, : sW - tW + 1]
+
+    # O(1) per-window sums via the integral images (shape is (sH+1, sW+1)).
+    win_sum = (
+        screen_sum[tH:, tW:] - screen_sum[:-tH, tW:]
+        - screen_sum[tH:, :-tW] + screen_sum[:-tH, :-tW]
+    )
+    win_sqsum = (
+        screen_sqsum[tH:, tW:] - screen_sqsum[:-tH, tW:]
+        - screen_sqsum[tH:, :-tW] + screen_sqsum[:-tH, :-tW]
+    )
+    win_var = win_sqsum - (win_sum * win_sum) / (tH * tW)
+    denom = np.sqrt(np.maximum(win_var, 0.0)) * tpl_norm
+
+    result = corr / np.maximum(denom, 1e-6)
+    # Flat windows: the numerator is analytically zero there, but the float
+    # residue of the large inverse DFT divided by the tiny denominator floor
+    # explodes into huge bogus scores. A window with under one gray level of
+    # std cannot contain the target, so zero those scores out.
+    result[win_var < tH * tW] = 0.0
+    return result
+
+def mean_prune(screen_sum: np.ndarray, tpl_shape, tpl_mean: float,
+               tau: float = MEAN_PRUNE_TAU):
+    """Return the bounding box (x, y, w, h) of candidate windows, or None.
+
+    Window means are sampled on a quarter-template-stride grid (tH/4 rows,
+    tW/4 columns), each in O(1) via the screen integral image; windows whose
+    mean intensity differs from the template's by more than `tau` are
+    rejected. The surviving box is padded by a template size on each side to
+    cover hits straddling the sampling grid. The prune is advisory only:
+    stride misalignment plus background contamination can push every sampled
+    window past `tau` even when the template is present, so a None return
+    means "narrow search found nothing", not "target absent" — the caller
+    must fall back to the full matcher.
+    """
+    tH, tW = tpl_shape
+    sH, sW = screen_sum.shape[0] - 1, screen_sum.shape[1] - 1
+    if sH < tH or sW < tW:
+        return None
+
+    ys = np.arange(0, sH - tH + 1, max(1, tH // 4))
+    xs = np.arange(0, sW - tW + 1, max(1, tW // 4))
+    win_sum = (
+        screen_sum[np.ix_(ys + tH, xs + tW)] - screen_sum[np.ix_(ys, xs + tW)]
+        - screen_sum[np.ix_(ys + tH, xs)] + screen_sum[np.ix_(ys, xs)]
+    )
+    keep_y, keep_x = np.nonzero(np.abs(win_sum / (tH * tW) - tpl_mean) <= tau)
+    if keep_y.size == 0:
+        return None
+
+    y0 = max(0, int(ys[keep_y.min()]) - tH)
+    y1 = min(sH, int(ys[keep_y.max()]) + 2 * tH)
+    x0 = max(0, int(xs[keep_x.min()]) - tW)
+    x1 = min(sW, int(xs[keep_x.max()]) + 2 * tW)
+    return x0, y0, x1 - x0, y1 - y0
+
+# Bits set per byte value, for vectorized popcounts over uint8 arrays.
+_POPCOUNT_LUT = np.unpackbits(
+    np.arange(256, dtype=np.uint8)[:, None], axis=1
+).sum(axis=1).astype(np.uint16)
+
+def hamming_prefilter(screen_gray: np.ndarray, t: dict, row_stride: int = 4):
+    """Locate the most promising window by bit-packed Hamming distance.
+
+    The screen is binarized and packed 8 pixels/byte, and windows are scored
+    at byte-aligned columns every `row_stride` rows, so one XOR + LUT
+    popcount covers 8 pixels at once. The result is coarse by construction;
+    the caller refines it with roi_match. Returns the best window's top-left
+    (x, y) in screen coordinates, or None if the template does not fit.
+    """
+    packed_t = t["packed"]
+    tH, tWb = packed_t.shape
+    packed_s = np.packbits(screen_gray > HAMMING_BIN_THRESHOLD, axis=1)
+    if packed_s.shape[0] < tH or packed_s.shape[1] < tWb:
+        return None
+
+    windows = sliding_window_view(packed_s, (tH, tWb))[::row_stride]
+    dist = _POPCOUNT_LUT[np.bitwise_xor(windows, packed_t)].sum(axis=(2, 3))
+    iy, ix = np.unravel_index(np.argmin(dist), dist.shape)
+    return int(ix) * 8, int(iy) * row_stride
+
+def roi_match(roi_gray: np.ndarray, t: dict, threshold: float = None):
+    """Match a template pyramid inside a region of interest.
+
+    The ROI is small compared to the screen, so a direct TM_CCOEFF_NORMED
+    call is cheaper than the FFT path while scoring on the same scale as it;
+    being mean-invariant, it also stays near zero on flat/blank regions where
+    SQDIFF-style scores look deceptively confident. Large ROIs go through
+    cv2.UMat so the correlation runs on the GPU when OpenCL is available.
+    """
+    found = None
+    use_gpu = USE_OPENCL and roi_gray.size >= OPENCL_MIN_ROI_PIXELS
+    # ROI slices can be non-contiguous views; UMat upload needs a solid block.
+    roi_src = cv2.UMat(np.ascontiguousarray(roi_gray)) if use_gpu else roi_gray
+
+    for i, (resized, scale) in enumerate(t["pyramid"]):
+        (tH, tW) = resized.shape[:2]
+        if roi_gray.shape[0] < tH or roi_gray.shape[1] < tW:
+            continue
+
+        tpl = t["pyramid_u"][i] if use_gpu else resized
+        result = cv2.matchTemplate(roi_src, tpl, cv2.TM_CCOEFF_NORMED)
+        _, maxVal, _, maxLoc = cv2.minMaxLoc(result)
+        if found is None or maxVal > found[0]:
+            found = (maxVal, maxLoc, (tH, tW), scale)
+            if threshold is not None and maxVal >= threshold:
+                break
+
+    return found  # (confidence, location, matched template shape, scale)
+
+# OpenCV releases the GIL inside its C++ kernels, so a small thread pool gets
+# real parallelism across the scale sweep without any native extension.
+_match_pool = ThreadPoolExecutor(max_workers=4)
+
+# Separate pool for the per-template searches: they submit scale work to
+# _match_pool, and sharing one pool for both levels risks starvation with
+# every worker blocked waiting on nested futures.
+_template_pool = ThreadPoolExecutor(max_workers=2)
+
+def _match_one_scale(screen_ctx, entry):
+    """Score a single pyramid entry against the screen context."""
+    resized, scale = entry
+    result = fft_match(screen_ctx, resized)
+    if result is None:
+        return None
+
+    _, maxVal, _, maxLoc = cv2.minMaxLoc(result)
+    return (maxVal, maxLoc, resized.shape[:2], scale)
+
+def _match_entries(screen_ctx, entries: list, threshold: float = None):
+    """Score a batch of pyramid entries, early-exiting past `threshold`."""
+    if len(entries) == 1:
+        # Single entry: no point paying pool dispatch overhead.
+        futures = None
+        candidates = [_match_one_scale(screen_ctx, entries[0])]
+    else:
+        futures = [
+            _match_pool.submit(_match_one_scale, screen_ctx, entry)
+            for entry in entries
+        ]
+        candidates = (f.result() for f in futures)
+
+    found = None
+    for i, cand in enumerate(candidates):
+        if cand and (found is None or cand[0] > found[0]):
+            found = cand
+            if threshold is not None and found[0] >= threshold:
+                if futures is not None:
+                    for f in futures[i + 1:]:
+                        f.cancel()
+                break
+
+    return found  # (confidence, location, matched template shape, scale)
+
+def multi_scale_match(screen_ctx, pyramid: list, threshold: float = None):
+    """Coarse-to-fine scale search over a precomputed template pyramid.
+
+    Pass 1 scores only the SCALE_COARSE scales; pass 2 refines around the
+    winner on the pyramid's SCALE_STEP grid. 6-8 evaluations give the same
+    final scale resolution as sweeping all 11 pyramid levels.
+    """
+    if len(pyramid) == 1:
+        return _match_one_scale(screen_ctx, pyramid[0])
+
+    by_scale = {round(s, 2): (img, s) for img, s in pyramid}
+    coarse = [by_scale[s] for s in SCALE_COARSE if s in by_scale]
+    found = _match_entries(screen_ctx, coarse, threshold)
+    if found is None or (threshold is not None and found[0] >= threshold):
+        return found
+
+    fine = []
+    for delta in (-2 * SCALE_STEP, -SCALE_STEP, SCALE_STEP, 2 * SCALE_STEP):
+        s = round(found[3] + delta, 2)
+        if s in by_scale and s not in SCALE_COARSE:
+            fine.append(by_scale[s])
+
+    refined = _match_entries(screen_ctx, fine, threshold) if fine else None
+    if refined and refined[0] > found[0]:
+        found = refined
+
+    return found  # (confidence, location, matched template shape, scale)
+
+def track_match(screen_gray: np.ndarray, name: str, t: dict,
+                threshold: float = None):
+    """Try a TRACK_WINDOW-sized window around the target's previous hit.
+
+    Returns a confident match in screen coordinates, or None if the target
+    was never seen or is no longer where it used to be (caller falls back to
+    the full search). `threshold` is the early-exit bound handed down to
+    roi_match; acceptance is always gated on MATCH_THRESHOLD.
+    """
+    last = _last_hit.get(name)
+    if last is None:
+        return None
+
+    hx, hy = last
+    half = TRACK_WINDOW // 2
+    y0 = max(0, hy - half)
+    x0 = max(0, hx - half)
+    window = screen_gray[y0:hy + half, x0:hx + half]
+
+    # A near-flat window cannot contain the button (the dialog is gone and
+    # bare desktop is showing); skip the correlation rather than trust any
+    # normalized score on degenerate input.
+    if window.size == 0 or int(window.max()) - int(window.min()) < 8:
+        return None
+
+    found = roi_match(window, t, threshold=threshold)
+    if not found or found[0] < MATCH_THRESHOLD:
+        return None
+
+    maxVal, maxLoc, shape, scale = found
+    return (maxVal, (maxLoc[0] + x0, maxLoc[1] + y0), shape, scale)
+
+def find_best_target(screen: np.ndarray):
+    """Return best target match info across all templates."""
+    # BGRA straight from mss; IPP-backed cvtColor does luma in one pass.
+    code = cv2.COLOR_BGRA2GRAY if screen.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    screen_gray = cv2.cvtColor(screen, code)
+
+    if ROI_RECT is not None:
+        rx, ry, rw, rh = ROI_RECT
+        roi_gray = screen_gray[ry:ry + rh, rx:rx + rw]
+        screen_ctx = None
+    else:
+        roi_gray = None
+        # Cheap prefilter input; the full DFT context is built lazily below
+        # only if some template survives pruning over too large an area.
+        screen_sum = cv2.integral(np.float32(screen_gray))
+        screen_ctx = None
+
+    best_target = None
+    best_conf = 0.0
+    best_coords = None
+    ctx_lock = threading.Lock()
+
+    # Calibration needs the exhaustive sweep: with the early exit active it
+    # would report the first scale crossing the threshold, not the best one,
+    # and that scale would get baked into TEMPLATE_SCALE.
+    threshold = None if MULTISCALE else MATCH_THRESHOLD
+
+    def search_one(item):
+        """Full search cascade for one template; runs on a pool worker."""
+        nonlocal screen_ctx
+        name, t = item
+        found = track_match(screen_gray, name, t, threshold=threshold)
+        if found is not None:
+            pass
+        elif roi_gray is not None:
+            found = roi_match(roi_gray, t, threshold=threshold)
+            if found:
+                maxVal, maxLoc, shape, scale = found
+                found = (maxVal, (maxLoc[0] + rx, maxLoc[1] + ry), shape, scale)
+        elif USE_HAMMING:
+            loc = hamming_prefilter(screen_gray, t)
+            if loc is not None:
+                # Alignment is 8 px horizontally / row_stride vertically, so
+                # pad the refinement window enough to cover the slack.
+                hx, hy = loc
+                tH, tW = t["gray"].shape[:2]
+                y0, x0 = max(0, hy - 16), max(0, hx - 16)
+                found = roi_match(
+                    screen_gray[y0:hy + tH + 16, x0:hx + tW + 16],
+                    t,
+                    threshold=threshold,
+                )
+                if found:
+                    maxVal, maxLoc, shape, scale = found
+                    found = (maxVal, (maxLoc[0] + x0, maxLoc[1] + y0), shape, scale)
+        else:
+            bb = mean_prune(screen_sum, t["gray"].shape[:2], t["mean"])
+            if bb is not None and bb[2] * bb[3] < 0.25 * screen_gray.size:
+                # Survivors cluster in a small area: match directly there.
+                bx, by, bw, bh = bb
+                found = roi_match(
+                    screen_gray[by:by + bh, bx:bx + bw],
+                    t,
+                    threshold=threshold,
+                )
+                if found:
+                    maxVal, maxLoc, shape, scale = found
+                    found = (maxVal, (maxLoc[0] + bx, maxLoc[1] + by), shape, scale)
+            else:
+                # Either the prune did not narrow the search, or it rejected
+                # everything — which can happen with the template present on
+                # a contrasting background, so it must not end the search.
+                with ctx_lock:
+                    if screen_ctx is None:
+                        screen_ctx = prepare_screen_ctx(screen_gray)
+                found = multi_scale_match(
+                    screen_ctx, t["pyramid"], threshold=threshold
+                )
+        return name, found
+
+    # OpenCV releases the GIL, so searching the templates concurrently
+    # overlaps their native work instead of serializing it in Python.
+    if len(templates) > 1:
+        results = _template_pool.map(search_one, templates.items())
+    else:
+        results = map(search_one, templates.items())
+
+    for name, found in results:
+        if found:
+            maxVal, maxLoc, shape, scale = found
+            if MULTISCALE:
+                logger.info(
+                    "Calibration: %r best scale=%.2f conf=%.3f", name, scale, maxVal
+                )
+            if maxVal > best_conf:
+                best_conf = maxVal
+                best_target = name
+                best_coords = (maxLoc, shape)
+
+    return best_target, best_conf, best_coords
+
+def click_target(best_target: str, best_conf: float, best_coords):
+    """Click the best matched target if above threshold and not in cooldown."""
+    if not best_target or best_conf < MATCH_THRESHOLD:
+        logger.info("No button found. Best confidence=%.3f", best_conf)
+        return False
+
+    now = time.time()
+    if (now - _last_click_ts.get(best_target, 0.0)) < CLICK_COOLDOWN_SEC:
+        logger.info(
+            "Cooldown active for %r. Skipping click. conf=%.3f", best_target, best_conf
+        )
+        return False
+
+    maxLoc, (tH, tW) = best_coords
+    x_center = int(maxLoc[0]) + tW // 2
+    y_center = int(maxLoc[1]) + tH // 2
+
+    pyautogui.click(x_center, y_center)
+    _last_click_ts[best_target] = now
+    _last_hit[best_target] = (x_center, y_center)
+
+    logger.info(
+        "Clicked %r at (%d, %d) [conf=%.3f]", best_target, x_center, y_center, best_conf
+    )
+    return True
+
+def find_and_click(screen: np.ndarray) -> bool:
+    """Find best target in the captured frame, click if valid."""
+    best_target, best_conf, best_coords = find_best_target(screen)
+
+    # Archive only misses: successful ticks leave nothing to debug.
+    if SAVE_SCREENSHOTS and best_conf < MATCH_THRESHOLD:
+        threading.Thread(
+            target=_archive_screenshot, args=(screen.copy(),), daemon=True
+        ).start()
+
+    # Log the best candidate even if below threshold
+    if best_target:
+        logger.info("Best match: %r conf=%.3f", best_target, best_conf)
+    return click_target(best_target, best_conf, best_coords)
+
+# -------------------- MAIN LOOP --------------------
+if __name__ == "__main__":
+    logger.info("Screen monitoring started. Press Ctrl+C to stop.")
+    last_fingerprint = None
+    last_full_scan = 0.0
+    # Fixed-cadence scheduler: sleeping toward an absolute monotonic deadline
+    # keeps the tick rate steady regardless of how long each scan takes,
+    # instead of drifting by the work time every iteration.
+    next_tick = time.monotonic()
+    while True:
+        try:
+            screen = capture_screen()
+            fingerprint = frame_fingerprint(screen)
+            now = time.monotonic()
+
+            if fingerprint != last_fingerprint or (now - last_full_scan) >= FULL_SCAN_SEC:
+                last_fingerprint = fingerprint
+                last_full_scan = now
+                find_and_click(screen)
+            # else: screen unchanged since last scan, skip the match pipeline.
+
+            next_tick += CHANGE_POLL_SEC
+            sleep_for = next_tick - time.monotonic()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+            else:
+                # The scan overran the cadence: realign rather than racing
+                # through back-to-back ticks to catch up.
+                next_tick = time.monotonic()
+
+        except KeyboardInterrupt:
+            logger.info("Script stopped by user.")
+            break
+
+        except pyautogui.FailSafeException:
+            logger.warning("PyAutoGUI FAILSAFE triggered (mouse moved to top-left). Exiting.")
+            break
+
+        except Exception as e:
+            logger.exception("Unexpected error: %s", e)
+            time.sleep(FULL_SCAN_SEC)
+            next_tick = time.monotonic()